@@ -29,6 +29,13 @@ var NGLView = widgets.WidgetView.extend({
         this.sync_frame = true;
         this.sync_camera = true;
 
+        // blobs sent by loadFile, by digest; kept on the model to be shared by all views
+        if( !this.model._ngl_blob_cache ){
+            // new frontend (or page reload): python must send full blobs again
+            this.model._ngl_blob_cache = {};
+            this.send({'type': 'blob_cache_reset'});
+        }
+
         // get message from Python
         this.model.on( "msg:custom", function (msg) {
             this.on_msg( msg );
@@ -380,6 +387,16 @@ var NGLView = widgets.WidgetView.extend({
         return arraybuffer;
     },
 
+    dequantize: function( buffer, scale, offset ) {
+        // int16 ArrayBuffer to float32 ArrayBuffer: q * scale + offset
+        var q = new Int16Array( buffer );
+        var coords = new Float32Array( q.length );
+        for ( var i = 0; i < q.length; i++ ){
+            coords[ i ] = q[ i ] * scale + offset;
+        }
+        return coords.buffer;
+    },
+
     updateCoordinates: function( coordinates, model ) {
         // coordinates must be ArrayBuffer (use this.decode_base64)
         var component = this.stage.compList[ model ];
@@ -390,6 +407,24 @@ var NGLView = widgets.WidgetView.extend({
         }
     },
 
+    setVisibilityAll: function( mask ){
+        // mask[ i ] is visibility of i-th component, null to keep it
+        for ( var i = 0; i < mask.length; i++ ){
+            var component = this.stage.compList[ i ];
+            if( mask[ i ] !== null && component ){
+                component.setVisibility( mask[ i ] );
+            }
+        }
+    },
+
+    evictBlobs: function( digests ){
+        // python keeps the blob cache bounded and tells us what to drop
+        var blobCache = this.model._ngl_blob_cache || {};
+        for ( var i = 0; i < digests.length; i++ ){
+            delete blobCache[ digests[ i ] ];
+        }
+    },
+
     setSize: function( width, height ){
         this.stage.viewer.container.style.width = width;
         this.stage.viewer.container.style.height = height;
@@ -468,15 +503,29 @@ var NGLView = widgets.WidgetView.extend({
                         if( msg.methodName == 'loadFile' ) {
                             // args = [{'type': ..., 'data': ...}]
                             var args0 = msg.args[ 0 ];
+                            var blobCache = this.model._ngl_blob_cache;
                             if( args0.type == 'blob' ) {
                                 var blob; 
                                 if( args0.binary ){
-                                    var decoded_data = this.decode_base64( args0.data );
-                                    blob = new Blob( [ decoded_data ], { type: "application/octet-binary" });
+                                    // raw bytes are sent in msg.buffers
+                                    var data = msg.buffers[ args0.data.buffer_index ];
+                                    blob = new Blob( [ data ], { type: "application/octet-binary" });
                                 }else{
                                     blob = new Blob( [ args0.data ], { type: "text/plain" } );
                                 }
+                                if( args0.digest ){
+                                    // python decides what is cached, see evictBlobs
+                                    blobCache[ args0.digest ] = blob;
+                                }
                                 this.stage.loadFile( blob, msg.kwargs );
+                            }else if( args0.type == 'cache_ref' ) {
+                                // same content was sent before
+                                if( blobCache[ args0.data ] ){
+                                    this.stage.loadFile( blobCache[ args0.data ], msg.kwargs );
+                                }else{
+                                    console.warn( "blob not in cache, load it again", args0.data );
+                                    this.send({'type': 'blob_cache_reset'});
+                                }
                             }else{
                                 this.stage.loadFile( msg.args[0].data, msg.kwargs );
                             }
@@ -517,6 +566,11 @@ var NGLView = widgets.WidgetView.extend({
                     console.log( "nothing done for " + msg.target );
                     break;
             }
+        }else if( msg.type == 'batch' ){
+            // messages queued in Python's hold_sync, run them in order
+            for ( var i = 0; i < msg.msgs.length; i++ ){
+                this.on_msg( msg.msgs[ i ] );
+            }
         }else if( msg.type == 'base64_single' ){
             // TODO: remove time
             var time0 = Date.now();
@@ -533,23 +587,32 @@ var NGLView = widgets.WidgetView.extend({
             }
             var time1 = Date.now();
             //console.log( time0 - msg.mytime, time1 - time0, 'base64_single' );
-        }else if( msg.type == 'binary_single' ){
-            // TODO: remove time
-            // console.log("msg.buffers",msg.buffers);
-            var time0 = Date.now();
-
-            var coordinateMeta = msg.data;
-            var keys = Object.keys( coordinateMeta );
-
-            for ( var i = 0; i < keys.length ; i++ ){
-                var traj_index = keys[ i ];
-                var coordinates = new Float32Array( msg.buffers[ i ].buffer );
-                if( coordinates.byteLength > 0 ){
+        }else if( msg.type == 'binary_v2' ){
+            // msg.buffers[ 0 ] is a little-endian header:
+            // uint32 n, uint32 dtype (0: float32, 1: int16), float64 scale,
+            // float64 offset, n uint32 component indices, n uint32 lengths
+            // msg.buffers[ 1 ] has all coordinates, back to back
+            var header = msg.buffers[ 0 ];
+            var dataView = msg.buffers[ 1 ];
+            var n = header.getUint32( 0, true );
+            var quantized = ( header.getUint32( 4, true ) == 1 );
+            var scale = header.getFloat64( 8, true );
+            var offset = header.getFloat64( 16, true );
+            var itemSize = quantized ? 2 : 4;
+            var start = dataView.byteOffset;
+
+            for ( var i = 0; i < n; i++ ){
+                var traj_index = header.getUint32( 24 + 4 * i, true );
+                var end = start + itemSize * header.getUint32( 24 + 4 * ( n + i ), true );
+                if( end > start ){
+                    var coordinates = dataView.buffer.slice( start, end );
+                    if( quantized ){
+                        coordinates = this.dequantize( coordinates, scale, offset );
+                    }
                     this.updateCoordinates( coordinates, traj_index );
                 }
+                start = end;
             }
-            var time1 = Date.now();
-            //console.log( time0 - msg.mytime, time1 - time0, 'binary_single' );
         }else if( msg.type == 'get') {
             console.log( msg.data );
 
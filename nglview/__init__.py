@@ -2,40 +2,59 @@
 from __future__ import print_function, absolute_import
 from .install import install, enable_nglview_js
 from . import datafiles
-from .utils import seq_to_string, string_types, _camelize_dict
-from .utils import FileManager, get_repr_names_from_dict
+from .utils import seq_to_string, string_types, _camelize_dict, _normalize_selection
+from .utils import FileManager, get_repr_names_from_dict, lru_cache
 from .widget_utils import get_widget_by_name
 from .player import TrajectoryPlayer
 from . import interpolate
 from .representation import Representation
 from .ngl_params import REPR_NAME_PAIRS
 import time
+import json
 
 import os
 import os.path
 import uuid
-import warnings
 import tempfile
+import struct
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import partial
+from pprint import pformat
 import ipywidgets as widgets
 from traitlets import (Unicode, Bool, Dict, List, Int, observe,
                        CaselessStrEnum,
                        TraitError)
 from ipywidgets import widget_image
+from tornado.ioloop import IOLoop
 
 try:
     from cStringIO import StringIO
 except ImportError:
     from io import StringIO
 
+from IPython import get_ipython
 from IPython.display import display, Javascript
-from notebook.nbextensions import install_nbextension
-from notebook.services.config import ConfigManager
 
 import numpy as np
 
-with warnings.catch_warnings():
-    warnings.simplefilter("ignore")
-    from pkg_resources import resource_filename
+try:
+    # faster
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+try:
+    from hashlib import blake2b as _blob_hash
+except ImportError:
+    # Python 2
+    from hashlib import sha1 as _blob_hash
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    # Python 2 without the futures backport
+    ThreadPoolExecutor = None
 
 try:
     from urllib.request import urlopen
@@ -43,47 +62,87 @@ except ImportError:
     from urllib2 import urlopen
 
 
-import base64
+try:
+    # SIMD accelerated
+    from pybase64 import b64encode, b64decode
+except ImportError:
+    from base64 import b64encode, b64decode
+
+def _as_f4(arr):
+    """return arr as float32, C-contiguous array, only copying if needed
+    """
+    if arr.dtype != np.float32 or not arr.flags['C_CONTIGUOUS']:
+        arr = np.ascontiguousarray(arr, dtype=np.float32)
+    return arr
+
+def _quantize_i2(arr):
+    """quantize float32 array to int16
+
+    Returns
+    -------
+    (q, scale, offset) so that arr ~ q * scale + offset
+    """
+    if arr.size == 0:
+        return arr.astype(np.int16), 1., 0.
+    lo = float(arr.min())
+    hi = float(arr.max())
+    scale = (hi - lo) / 65534. or 1.
+    # map [lo, hi] to [-32767, 32767]
+    offset = lo + 32767. * scale
+    q = arr - offset
+    q /= scale
+    np.rint(q, out=q)
+    return q.astype(np.int16), scale, offset
 
 def encode_base64(arr, dtype='f4'):
-    arr = arr.astype(dtype)
-    return base64.b64encode(arr.data).decode('utf8')
+    # no copy if arr already has the right dtype and memory layout
+    arr = np.ascontiguousarray(arr, dtype=dtype)
+    return b64encode(memoryview(arr)).decode('ascii')
 
 def decode_base64(data, shape, dtype='f4'):
     import numpy as np
-    decoded_str = base64.b64decode(data)
+    decoded_str = b64decode(data)
     return np.frombuffer(decoded_str, dtype=dtype).reshape(shape)
 
-def _add_repr_method_shortcut(self, other):
-    from types import MethodType
+# skeleton of _remote_call messages
+_MSG_TEMPLATE = {'target': None, 'type': 'call_method', 'methodName': None,
+                 'args': None, 'kwargs': None}
+_SENTINEL = object()
 
-    def make_func_add(rep):
-        """return a new function object
-        """
-        def func(this, selection='all', **kwargs):
-            """
-            """
-            self.add_representation(repr_type=rep[1], selection=selection, **kwargs)
-        return func
-
-    def make_func_remove(rep):
-        """return a new function object
-        """
-        def func(this, **kwargs):
-            """
-            """
-            self._remove_representations_by_name(repr_name=rep[1], **kwargs)
-        return func
+def _blob_digest(blob):
+    '''hex digest of a structure blob (text or bytes-like), used to skip resending it
+    '''
+    if isinstance(blob, string_types) and not isinstance(blob, bytes):
+        blob = blob.encode('utf8')
+    return _blob_hash(blob).hexdigest()
 
-    for rep in REPR_NAME_PAIRS:
-        func_add = make_func_add(rep)
-        fn_add = 'add_' + rep[0]
+def _get_kernel_ioloop():
+    '''IOLoop of the running IPython kernel, IOLoop.current() outside of a kernel
+    '''
+    try:
+        return get_ipython().kernel.io_loop
+    except AttributeError:
+        return IOLoop.current()
 
-        func_remove = make_func_remove(rep)
-        fn_remove = '_remove_' + rep[0]
+_REPR_MAP = dict(REPR_NAME_PAIRS)
+_REPR_SHORTCUT_NAMES = (['add_' + name for name in _REPR_MAP] +
+                        ['_remove_' + name for name in _REPR_MAP])
 
-        setattr(self, fn_add, MethodType(func_add, other))
-        setattr(self, fn_remove, MethodType(func_remove, other))
+def _get_repr_method_shortcut(obj, attr):
+    """return `add_<repr>` or `_remove_<repr>` shortcut of obj (e.g: add_cartoon)
+
+    obj must have `add_representation` and `_remove_representations_by_name` methods.
+    """
+    if attr.startswith('add_'):
+        rep = _REPR_MAP.get(attr[len('add_'):])
+        if rep is not None:
+            return partial(obj.add_representation, rep)
+    elif attr.startswith('_remove_'):
+        rep = _REPR_MAP.get(attr[len('_remove_'):])
+        if rep is not None:
+            return partial(obj._remove_representations_by_name, rep)
+    raise AttributeError("'{}' object has no attribute '{}'".format(
+                         type(obj).__name__, attr))
 
 
 ##############
@@ -311,8 +370,7 @@ class RdkitStructure(Structure):
 
     def get_structure_string(self):
         from rdkit import Chem
-        fh = StringIO(Chem.MolToPDBBlock(self._rdkit_mol))
-        return fh.read()
+        return Chem.MolToPDBBlock(self._rdkit_mol)
 
 class PdbIdStructure(Structure):
 
@@ -323,8 +381,39 @@ class PdbIdStructure(Structure):
         self.params = {}
 
     def get_structure_string(self):
-        url = "http://www.rcsb.org/pdb/files/" + self.pdbid + ".cif"
-        return urlopen(url).read()
+        return _fetch_pdb_cif(self.pdbid)
+
+
+@lru_cache(maxsize=64)
+def _fetch_pdb_cif(pdbid):
+    # PDB entries do not change, download each of them only once
+    url = "http://www.rcsb.org/pdb/files/" + pdbid + ".cif"
+    return urlopen(url).read()
+
+
+def _read_via_tempfile(save, suffix='.pdb'):
+    '''call save(filename) with a temporary file and return its content
+    '''
+    fd, fname = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        save(fname)
+        with open(fname) as fh:
+            return fh.read()
+    finally:
+        os.remove(fname)
+
+
+def _get_structure_strings(structures):
+    '''call get_structure_string of each structure, concurrently if there are many
+
+    Adaptors mostly wait on file or network I/O, so threads help.
+    '''
+    if ThreadPoolExecutor is None or len(structures) < 2:
+        return [structure.get_structure_string() for structure in structures]
+    with ThreadPoolExecutor(max_workers=min(8, len(structures))) as executor:
+        return list(executor.map(lambda structure: structure.get_structure_string(),
+                                 structures))
 
 
 class Trajectory(object):
@@ -403,18 +492,16 @@ class MDTrajTrajectory(Trajectory, Structure):
         self.id = str(uuid.uuid4())
 
     def get_coordinates(self, index):
-        return 10*self.trajectory.xyz[index]
+        # nm -> angstrom, scale and cast to float32 in a single pass
+        return np.multiply(self.trajectory.xyz[index], 10, dtype=np.float32)
 
     @property
     def n_frames(self):
         return self.trajectory.n_frames
 
     def get_structure_string(self):
-        fd, fname = tempfile.mkstemp()
-        self.trajectory[0].save_pdb(fname)
-        pdb_string = os.fdopen(fd).read()
-        # os.close( fd )
-        return pdb_string
+        # mdtraj's PDB writer only accepts file names
+        return _read_via_tempfile(self.trajectory[0].save_pdb)
 
 
 class PyTrajTrajectory(Trajectory, Structure):
@@ -443,11 +530,10 @@ class PyTrajTrajectory(Trajectory, Structure):
         return self.trajectory.n_frames
 
     def get_structure_string(self):
-        fd, fname = tempfile.mkstemp(suffix=".pdb")
-        self.trajectory[:1].save(fname, format="pdb", overwrite=True)
-        pdb_string = os.fdopen(fd).read()
-        # os.close( fd )
-        return pdb_string
+        # pytraj's writer only accepts file names
+        def save(fname):
+            self.trajectory[:1].save(fname, format="pdb", overwrite=True)
+        return _read_via_tempfile(save)
 
 class ParmEdTrajectory(Trajectory, Structure):
     '''ParmEd adaptor.
@@ -469,17 +555,14 @@ class ParmEdTrajectory(Trajectory, Structure):
         return len(self._xyz)
 
     def get_structure_string(self):
-        fd, fname = tempfile.mkstemp(suffix=".pdb")
+        fh = StringIO()
         # only write 1st model
         if self.only_save_1st_model:
-            self.trajectory.save(
-                fname, overwrite=True,
+            self.trajectory.write_pdb(fh,
                 coordinates=self.trajectory.coordinates)
         else:
-            self.trajectory.save(fname, overwrite=True)
-        pdb_string = os.fdopen(fd).read()
-        # os.close( fd )
-        return pdb_string
+            self.trajectory.write_pdb(fh)
+        return fh.getvalue()
 
 
 class MDAnalysisTrajectory(Trajectory, Structure):
@@ -563,8 +646,24 @@ class NGLWidget(widgets.DOMWidget):
 
     displayed = False
     _ngl_msg = None
+    # frame of coordinates_dict if it has not been built yet
+    _coordinates_frame = None
+    # send at most one frame per _frame_push_interval (second)
+    _frame_push_interval = 0.016
+    _pending_frame = None
+    _frame_timer = None
+    _last_frame_push = 0.
+    # clock used to coalesce frames
+    _clock = staticmethod(time.time)
     _send_binary = Bool(True).tag(sync=False)
+    # dtype of binary coordinates: 'f4' or 'i2' (quantized, half the size)
+    _wire_dtype = CaselessStrEnum(['f4', 'i2'], default_value='f4').tag(sync=False)
     _init_gui = Bool(False).tag(sync=False)
+    # max bytes of blobs kept by JS to be reused via 'cache_ref' (0: off)
+    # e.g. set to 64 * 2**20 when loading the same big file many times
+    _blob_cache_nbytes = 0
+    # True inside bulk_add
+    _in_bulk_add = False
 
     def __init__(self, structure=None, representations=None, parameters=None, **kwargs):
         super(NGLWidget, self).__init__(**kwargs)
@@ -574,16 +673,33 @@ class NGLWidget(widgets.DOMWidget):
         self._theme = kwargs.pop('theme', 'default')
         self._widget_image = widget_image.Image()
         self._widget_image.width = 900.
-        # do not use _displayed_callbacks since there is another Widget._display_callbacks
-        self._ngl_displayed_callbacks = []
-        _add_repr_method_shortcut(self, self)
+        # (msg, buffers) of _remote_call made before the widget is displayed
+        self._ngl_pending_msgs = []
+        # _remote_call messages queued by hold_sync
+        self._msg_queue = None
+        # LRU of digest -> nbytes of blobs cached in JS (see _load_data)
+        self._blob_digests = OrderedDict()
+        self._blob_cache_used = 0
+        # component id -> digest of the blob it was loaded from
+        self._component_digests = {}
+        # per-trajectory output buffers for interpolation, reused across frames
+        self._interp_buf = {}
+        # the kernel's loop: frames may be changed from another thread (e.g. player)
+        # where IOLoop.current() is not the loop that runs
+        self._ioloop = _get_kernel_ioloop()
 
         # register to get data from JS side
         self.on_msg(self._ngl_handle_msg)
 
         self._trajlist = []
+        # trajectory id -> trajectory
+        self._traj_by_id = {}
 
         self._ngl_component_ids = []
+        # component id -> index in _ngl_component_ids
+        self._component_index_map = {}
+        # component index -> (component id, ComponentViewer)
+        self._component_viewer_cache = {}
         self._init_structures = []
         if parameters:
             self.parameters = parameters
@@ -664,7 +780,6 @@ class NGLWidget(widgets.DOMWidget):
 
     @observe('picked')
     def _on_picked(self, change):
-        import json
         picked = change['new']
         self.player.picked_widget.value = json.dumps(picked)
         
@@ -676,7 +791,9 @@ class NGLWidget(widgets.DOMWidget):
     @observe('_n_dragged_files')
     def on_update_dragged_file(self, change):
         if change['new'] - change['old'] == 1:
-            self._ngl_component_ids.append(uuid.uuid4())
+            # keep _ngl_component_names aligned with _ngl_component_ids
+            self._ngl_component_names.append('dragged file')
+            self._append_component_id(uuid.uuid4())
 
     @observe('n_components')
     def _handle_n_components_changed(self, change):
@@ -716,9 +833,10 @@ class NGLWidget(widgets.DOMWidget):
 
         reprlist_choices = get_widget_by_name(self.player.repr_widget, 'reprlist_choices')
         repr_names = get_repr_names_from_dict(self._repr_dict, component_slider.value)
+        choices = tuple(str(i) + '-' + name for (i, name) in enumerate(repr_names))
 
         if change['new']:
-            reprlist_choices.options = tuple([str(i) + '-' + name for (i, name) in enumerate(repr_names)])
+            reprlist_choices.options = choices
 
             try:
                 reprlist_choices.value = reprlist_choices.options[repr_slider.value]
@@ -732,14 +850,15 @@ class NGLWidget(widgets.DOMWidget):
             # e.g: 0-cartoon
             repr_name_text.value = reprlist_choices.value.split('-')[-1]
 
-            repr_slider.max = len(repr_names) - 1 if len(repr_names) >= 1 else len(repr_names)
+            repr_slider.max = len(choices) - 1 if len(choices) >= 1 else len(choices)
 
         if change['new'] == {'c0': {}}:
             repr_selection.value = ''
 
     def _update_count(self):
-         self.count = max(traj.n_frames for traj in self._trajlist if hasattr(traj,
-                         'n_frames'))
+        n_frames = [traj.n_frames for traj in self._trajlist if hasattr(traj, 'n_frames')]
+        if n_frames:
+            self.count = max(n_frames)
 
     @observe('loaded')
     def on_loaded(self, change):
@@ -747,7 +866,18 @@ class NGLWidget(widgets.DOMWidget):
         time.sleep(0.1)
 
         if change['new']:
-            [callback(self) for callback in self._ngl_displayed_callbacks]
+            # send queued messages in as few batches as possible, a message
+            # having buffers can not be batched
+            msgs = []
+            for msg, buffers in self._ngl_pending_msgs:
+                if buffers is None:
+                    msgs.append(msg)
+                else:
+                    self._send_msgs(msgs)
+                    msgs = []
+                    self.send(msg, buffers=buffers)
+            self._send_msgs(msgs)
+            self._ngl_pending_msgs = []
 
     def _ipython_display_(self, **kwargs):
         self.displayed = True
@@ -871,46 +1001,127 @@ class NGLWidget(widgets.DOMWidget):
             list of Structure or Trajectory
         """
         _init_structure_list = structures if isinstance(structures, (list, tuple)) else [structures,]
-        self._init_structure_list = [{"data": _structure.get_structure_string(),
+        data = _get_structure_strings(_init_structure_list)
+        self._init_structure_list = [{"data": _data,
                                 "ext": _structure.ext,
                                 "params": _structure.params,
                                 "id": _structure.id
-                                } for _structure in _init_structure_list]
+                                } for _structure, _data in zip(_init_structure_list, data)]
 
     def _set_coordinates(self, index):
         '''update coordinates for all trajectories at index-th frame
         '''
         if self._trajlist:
-            coordinates_dict = {}
-            for trajectory in self._trajlist:
-                traj_index = self._ngl_component_ids.index(trajectory.id)
-
-                try:
-                    if trajectory.shown:
-                        if self.player.interpolate:
-                            t = self.player.iparams.get('t', 0.5)
-                            step = self.player.iparams.get('step', 1)
-                            itype = self.player.iparams.get('type', 'linear')
-
-                            if itype == 'linear':
-                                coordinates_dict[traj_index] = interpolate.linear(index,
-                                        t=t, traj=trajectory, step=step)
-                            elif itype == 'spline':
-                                coordinates_dict[traj_index] = interpolate.spline(index,
-                                        t=t, traj=trajectory, step=step)
-                            else:
-                                raise ValueError('interpolation type must be linear or spline')
-                        else:
-                            coordinates_dict[traj_index] = trajectory.get_coordinates(index)
-                    else:
-                        coordinates_dict[traj_index] = np.empty((0), dtype='f4')
-                except (IndexError, ValueError):
-                    coordinates_dict[traj_index] = np.empty((0), dtype='f4')
-
-            self.coordinates_dict = coordinates_dict
+            # coordinates_dict is only built if someone asks for it
+            self._coordinates_frame = index
+            if self._send_binary:
+                self._push_frame_binary(index)
+            else:
+                arr_dict = dict((self._component_index_map[traj.id],
+                                 self._get_frame_buffer(traj, index))
+                                for traj in self._trajlist if traj.shown)
+                if arr_dict:
+                    self._send_coordinates(arr_dict)
         else:
             print("no trajectory available")
 
+    def _push_frame_binary(self, index):
+        '''send coordinates for all shown trajectories at index-th frame in a single pass
+
+        Hidden trajectories are not sent, NGL keeps their current coordinates.
+        '''
+        items = []
+        for trajectory in self._trajlist:
+            if trajectory.shown:
+                # converted to float32 while being copied to the frame buffer
+                items.append((self._component_index_map[trajectory.id],
+                              self._get_frame_coordinates(trajectory, index,
+                                                          reuse_buffer=True)))
+        if items:
+            # nothing to send if all trajectories are hidden
+            self._send_concat_buffer(items)
+
+    def _send_concat_buffer(self, items):
+        '''send coordinates as a single buffer, described by a binary header
+
+        The header (first buffer) is little-endian:
+        uint32 n, uint32 dtype (0: float32, 1: int16 quantized),
+        float64 scale, float64 offset, n uint32 component indices,
+        n uint32 lengths (in items). Coordinates (second buffer) are
+        stored back to back in that order.
+
+        Parameters
+        ----------
+        items : list of (component index, array)
+        '''
+        coordinates_meta = dict()
+        indices = []
+        lengths = []
+        offset = 0
+        for traj_index, arr in items:
+            coordinates_meta[traj_index] = [offset, arr.size]
+            indices.append(traj_index)
+            lengths.append(arr.size)
+            offset += arr.size
+
+        # always use a new buffer: the kernel might send it after we return
+        concat_buf = np.empty(offset, dtype='f4')
+        for traj_index, arr in items:
+            start, size = coordinates_meta[traj_index]
+            np.copyto(concat_buf[start:start+size], arr.reshape(-1), casting='unsafe')
+
+        if self._wire_dtype == 'i2':
+            wire_buf, scale, shift = _quantize_i2(concat_buf)
+            dtype_code = 1
+        else:
+            wire_buf, scale, shift = concat_buf, 1., 0.
+            dtype_code = 0
+        n = len(indices)
+        header = struct.pack('<2I2d%dI' % (2 * n), n, dtype_code, scale, shift,
+                             *(indices + lengths))
+        self.send({'type': 'binary_v2'}, buffers=[header, memoryview(wire_buf)])
+
+    def _get_frame_coordinates(self, trajectory, index, reuse_buffer=False):
+        '''return coordinates of given trajectory at index-th frame
+
+        An empty array is returned if the trajectory is hidden or the frame
+        is not available.
+
+        If reuse_buffer is True, interpolated coordinates are written to a
+        per-trajectory buffer that is overwritten by the next frame; only for
+        callers that consume the array right away (e.g. sending it).
+        '''
+        try:
+            if not trajectory.shown:
+                return np.empty((0), dtype='f4')
+
+            if self.player.interpolate:
+                t = self.player.iparams.get('t', 0.5)
+                step = self.player.iparams.get('step', 1)
+                itype = self.player.iparams.get('type', 'linear')
+
+                out = self._interp_buf.get(trajectory.id) if reuse_buffer else None
+                if itype == 'linear':
+                    coordinates = interpolate.linear(index,
+                            t=t, traj=trajectory, step=step, out=out)
+                elif itype == 'spline':
+                    coordinates = interpolate.spline(index,
+                            t=t, traj=trajectory, step=step, out=out)
+                else:
+                    raise ValueError('interpolation type must be linear or spline')
+                if reuse_buffer:
+                    self._interp_buf[trajectory.id] = coordinates
+                return coordinates
+
+            return trajectory.get_coordinates(index)
+        except (IndexError, ValueError):
+            return np.empty((0), dtype='f4')
+
+    def _get_frame_buffer(self, trajectory, index):
+        """return float32, C-contiguous coordinates of a trajectory frame
+        """
+        return _as_f4(self._get_frame_coordinates(trajectory, index, reuse_buffer=True))
+
     @property
     def coordinates_dict(self):
         """
@@ -920,35 +1131,66 @@ class NGLWidget(widgets.DOMWidget):
         out : dict of numpy 3D-array, dtype='f4'
             coordinates of trajectories at current frame
         """
+        if self._coordinates_frame is not None:
+            index = self._coordinates_frame
+            self._coordinates_frame = None
+            self._coordinates_dict = dict((self._component_index_map[traj.id],
+                                           self._get_frame_coordinates(traj, index))
+                                          for traj in self._trajlist)
         return self._coordinates_dict
 
     @coordinates_dict.setter
     def coordinates_dict(self, arr_dict):
+        self._coordinates_frame = None
         self._coordinates_dict = arr_dict
+        self._send_coordinates(dict((k, _as_f4(v)) for (k, v) in arr_dict.items()))
 
+    def _send_coordinates(self, arr_dict):
+        """send float32, C-contiguous coordinates to NGL
+        """
         if not self._send_binary:
             # send base64
             encoded_coordinates_dict = dict((k, encode_base64(v))
-                                 for (k, v) in self._coordinates_dict.items())
+                                 for (k, v) in arr_dict.items())
             mytime = time.time() * 1000
             self.send({'type': 'base64_single', 'data': encoded_coordinates_dict,
                 'mytime': mytime})
         else:
             # send binary
-            buffers = []
-            coordinates_meta = dict()
-            for index, arr in self._coordinates_dict.items():
-                buffers.append(arr.astype('f4').tobytes())
-                coordinates_meta[index] = index
-            mytime = time.time() * 1000
-            self.send({'type': 'binary_single', 'data': coordinates_meta,
-                'mytime': mytime}, buffers=buffers)
+            self._send_concat_buffer(list(arr_dict.items()))
 
     @observe('frame')
     def on_frame(self, change):
         """set and send coordinates at current frame
+
+        Frame changes coming faster than `_frame_push_interval` (e.g. dragging
+        the slider) are coalesced and only the latest frame is sent.
         """
-        self._set_coordinates(self.frame)
+        self._pending_frame = change['new']
+        self._coordinates_frame = change['new']
+
+        elapsed = self._clock() - self._last_frame_push
+        if elapsed >= self._frame_push_interval:
+            self._flush_frame()
+        elif self._frame_timer is None:
+            # add_callback is the only thread-safe IOLoop method
+            self._frame_timer = True
+            self._ioloop.add_callback(self._start_frame_timer,
+                                      self._frame_push_interval - elapsed)
+
+    def _start_frame_timer(self, delay):
+        self._frame_timer = self._ioloop.call_later(delay, self._on_frame_timer)
+
+    def _on_frame_timer(self):
+        self._frame_timer = None
+        self._flush_frame()
+
+    def _flush_frame(self):
+        if self._pending_frame is not None:
+            index = self._pending_frame
+            self._pending_frame = None
+            self._last_frame_push = self._clock()
+            self._set_coordinates(index)
 
     def clear(self, *args, **kwargs):
         self.clear_representations(*args, **kwargs)
@@ -998,7 +1240,7 @@ class NGLWidget(widgets.DOMWidget):
         # avoid space sensitivity
         repr_type = repr_type.strip()
         # overwrite selection
-        selection = seq_to_string(selection).strip()
+        selection = _normalize_selection(selection)
 
         # make copy
         kwargs2 = _camelize_dict(kwargs)
@@ -1008,22 +1250,14 @@ class NGLWidget(widgets.DOMWidget):
         else:
             component = 0
 
-        for k, v in kwargs2.items():
-            try:
-                kwargs2[k] = v.strip()
-            except AttributeError:
-                # e.g.: opacity=0.4
-                kwargs2[k] = v
-
-        d = {'params': {'sele': selection}}
-        d['type'] = repr_type
-        d['params'].update(kwargs2)
-
-        params = d['params']
-        params.update({'component_index': component})
+        params = {'sele': selection}
+        # only strip strings, e.g.: skip opacity=0.4
+        params.update((k, v.strip() if isinstance(v, string_types) else v)
+                      for k, v in kwargs2.items())
+        params['component_index'] = component
         self._remote_call('addRepresentation',
                           target='compList',
-                          args=[d['type'],],
+                          args=[repr_type,],
                           kwargs=params)
 
 
@@ -1123,26 +1357,29 @@ class NGLWidget(widgets.DOMWidget):
 
         How? use view.on_msg(get_msg)
         """
-        import json
         if isinstance(msg, string_types):
-            self._ngl_msg = json.loads(msg)
+            # JSON dump of camera or stage parameters
+            self._ngl_msg = _json_loads(msg)
         else:
             self._ngl_msg = msg
 
             msg_type = self._ngl_msg.get('type')
             if msg_type == 'request_frame':
-                self.frame += self.player.step
-                if self.frame >= self.count:
-                    self.frame = 0
-                elif self.frame < 0:
-                    self.frame = self.count - 1
+                # set frame only once (each change sends coordinates)
+                frame = self.frame + self.player.step
+                if frame >= self.count:
+                    frame = 0
+                elif frame < 0:
+                    frame = self.count - 1
+                self.frame = frame
             elif msg_type == 'repr_parameters':
                 data_dict = self._ngl_msg.get('data')
                 repr_name = data_dict.pop('name') + '\n'
                 repr_selection = data_dict.get('sele') + '\n'
-                # json change True to true
-                data_dict_json = json.dumps(data_dict).replace('true', 'True').replace('false', 'False')
-                data_dict_json = data_dict_json.replace('null', '"null"')
+                # show as Python literal (True, False, ...), player reads it back
+                # with ast.literal_eval
+                data_dict_text = pformat(dict((k, 'null' if v is None else v)
+                                              for k, v in data_dict.items()))
 
                 # TODO: refactor
                 repr_info_box = get_widget_by_name(self.player.repr_widget, 'repr_info_box')
@@ -1150,9 +1387,13 @@ class NGLWidget(widgets.DOMWidget):
                 repr_info_box.children[1].value = repr_selection
 
                 repr_text_box = get_widget_by_name(self.player.repr_widget, 'repr_text_box')
-                repr_text_box.children[-1].value = data_dict_json
+                repr_text_box.children[-1].value = data_dict_text
             elif msg_type == 'all_reprs_info':
                 self._repr_dict = self._ngl_msg.get('data')
+            elif msg_type == 'blob_cache_reset':
+                # a new frontend has an empty blob cache
+                self._blob_digests.clear()
+                self._blob_cache_used = 0
             elif msg_type == 'stage_parameters':
                 self._full_stage_parameters = msg.get('data')
 
@@ -1179,16 +1420,18 @@ class NGLWidget(widgets.DOMWidget):
         >>> # then add Structure
         >>> view.add_structure(...)
         '''
+        digest = None
         if self.loaded:
-            self._load_data(structure, **kwargs)
+            digest = self._load_data(structure, **kwargs)
         else:
             # update via structure_list
             self._init_structures.append(structure)
             name = kwargs.pop('name', str(structure))
             self._ngl_component_names.append(name)
-        self._ngl_component_ids.append(structure.id)
+        self._append_component_id(structure.id, digest=digest)
         self.center_view(component=len(self._ngl_component_ids)-1)
-        self._update_component_auto_completion()
+        if not self._in_bulk_add:
+            self._update_component_auto_completion()
 
     def add_trajectory(self, trajectory, **kwargs):
         '''
@@ -1214,8 +1457,9 @@ class NGLWidget(widgets.DOMWidget):
         else:
             trajectory = trajectory
 
+        digest = None
         if self.loaded:
-            self._load_data(trajectory, **kwargs)
+            digest = self._load_data(trajectory, **kwargs)
         else:
             # update via structure_list
             self._init_structures.append(trajectory)
@@ -1223,9 +1467,46 @@ class NGLWidget(widgets.DOMWidget):
             self._ngl_component_names.append(name)
         setattr(trajectory, 'shown', True)
         self._trajlist.append(trajectory)
-        self._update_count()
-        self._ngl_component_ids.append(trajectory.id)
-        self._update_component_auto_completion()
+        self._traj_by_id[trajectory.id] = trajectory
+        self._append_component_id(trajectory.id, digest=digest)
+        if not self._in_bulk_add:
+            self._update_count()
+            self._update_component_auto_completion()
+
+    def add_trajectories(self, trajectories, **kwargs):
+        '''add many trajectories, see `add_trajectory`
+
+        Examples
+        --------
+        >>> view.add_trajectories([traj0, traj1, traj2])
+        '''
+        with self.bulk_add():
+            for trajectory in trajectories:
+                self.add_trajectory(trajectory, **kwargs)
+
+    @contextmanager
+    def bulk_add(self):
+        '''defer frame count and auto-completion updates of add_* methods
+        until the outermost context manager exits
+
+        Examples
+        --------
+        >>> with view.bulk_add():
+        ...     for traj in trajs:
+        ...         view.add_trajectory(traj)
+        '''
+        if self._in_bulk_add:
+            yield
+            return
+
+        self._in_bulk_add = True
+        try:
+            with self.hold_sync():
+                yield
+        finally:
+            self._in_bulk_add = False
+            self._update_count()
+            self._rebuild_component_auto_completion()
 
     def add_component(self, filename, **kwargs):
         '''add component from file/trajectory/struture
@@ -1246,10 +1527,11 @@ class NGLWidget(widgets.DOMWidget):
         >>> view
         >>> view.add_component(filename)
         '''
-        self._load_data(filename, **kwargs)
+        digest = self._load_data(filename, **kwargs)
         # assign an ID
-        self._ngl_component_ids.append(str(uuid.uuid4()))
-        self._update_component_auto_completion()
+        self._append_component_id(str(uuid.uuid4()), digest=digest)
+        if not self._in_bulk_add:
+            self._update_component_auto_completion()
 
     def _load_data(self, obj, **kwargs):
         '''
@@ -1278,34 +1560,82 @@ class NGLWidget(widgets.DOMWidget):
                 fh = FileManager(obj,
                                  ext=kwargs.get('ext'),
                                  compressed=kwargs.get('compressed'))
-                # assume passing string
-                blob = fh.read()
                 passing_buffer = not fh.use_filename
+                if passing_buffer and fh.use_mmap and self.displayed is True:
+                    # large binary file, sent as a comm buffer right away.
+                    # Not for pending messages: the file could change (or shrink)
+                    # before they are sent
+                    blob = fh.read_mmap()
+                else:
+                    # assume passing string
+                    blob = fh.read()
 
                 if fh.ext is None and passing_buffer:
                     raise ValueError('must provide extension')
 
                 kwargs2['ext'] = fh.ext
                 binary = fh.is_binary
-                use_filename = fh.use_filename
 
-            if binary and not use_filename:
-                # send base64
-                blob = base64.b64encode(blob).decode('utf8')
-            blob_type = 'blob' if passing_buffer else 'path'
-            args=[{'type': blob_type, 'data': blob, 'binary': binary}]
+            buffers = None
+            if passing_buffer:
+                digest = _blob_digest(blob) if self._blob_cache_nbytes else None
+                if digest is not None and digest in self._blob_digests:
+                    # JS keeps blobs it got, refer to it by digest
+                    # (re-insert to mark as most recently used)
+                    self._blob_digests[digest] = self._blob_digests.pop(digest)
+                    args = [{'type': 'cache_ref', 'data': digest, 'binary': binary}]
+                else:
+                    if digest is not None and not self._cache_blob(digest, blob):
+                        digest = None
+                    if binary:
+                        # send raw bytes as a comm buffer, JSON only has its index
+                        buffers = [memoryview(blob)]
+                        blob = {'buffer_index': 0}
+                    args = [{'type': 'blob', 'data': blob, 'binary': binary,
+                             'digest': digest}]
+            else:
+                args = [{'type': 'path', 'data': blob, 'binary': binary}]
         else:
             # is_url
             blob_type = 'url'
             url = obj
             args=[{'type': blob_type, 'data': url, 'binary': False}]
+            buffers = None
+            digest = None
 
         name = kwargs2.pop('name', str(obj))
         self._ngl_component_names.append(name)
         self._remote_call("loadFile",
                 target='Stage',
                 args=args,
-                kwargs=kwargs2)
+                kwargs=kwargs2,
+                buffers=buffers)
+        return digest
+
+    def _cache_blob(self, digest, blob):
+        '''record that JS will keep `blob` under `digest`, evicting the least
+        recently used blobs to stay within `_blob_cache_nbytes`
+
+        Returns False if the blob is too large to be cached.
+        '''
+        nbytes = blob.nbytes if isinstance(blob, memoryview) else len(blob)
+        if nbytes > self._blob_cache_nbytes:
+            return False
+        evicted = []
+        while self._blob_cache_used + nbytes > self._blob_cache_nbytes:
+            old_digest, old_nbytes = self._blob_digests.popitem(last=False)
+            self._blob_cache_used -= old_nbytes
+            evicted.append(old_digest)
+        self._evict_blobs(evicted)
+        self._blob_digests[digest] = nbytes
+        self._blob_cache_used += nbytes
+        return True
+
+    def _evict_blobs(self, digests):
+        '''tell JS to drop cached blobs, `digests` must not be in `_blob_digests`
+        '''
+        if digests:
+            self._remote_call('evictBlobs', target='Widget', args=[digests,])
 
     def remove_component(self, component_id):
         """remove component by its uuid
@@ -1319,16 +1649,34 @@ class NGLWidget(widgets.DOMWidget):
         >>> view.remove_component(view._ngl_component_ids[-1])
         """
         self._clear_component_auto_completion()
-        if self._trajlist:
-            for traj in self._trajlist:
-                if traj.id == component_id:
-                    self._trajlist.remove(traj)
-        component_index = self._ngl_component_ids.index(component_id)
-        self._ngl_component_ids.remove(component_id)
+        traj = self._traj_by_id.pop(component_id, None)
+        if traj is not None:
+            self._trajlist.remove(traj)
+            self._interp_buf.pop(traj.id, None)
+        digest = self._component_digests.pop(component_id, None)
+        if (digest in self._blob_digests and
+                digest not in self._component_digests.values()):
+            self._blob_cache_used -= self._blob_digests.pop(digest)
+            self._evict_blobs([digest])
+        component_index = self._component_index_map[component_id]
+        del self._ngl_component_ids[component_index]
+        self._update_component_index_map()
         self._ngl_component_names.pop(component_index)
 
         self._remove_component(component=component_index)
-        self._update_component_auto_completion()
+        if not self._in_bulk_add:
+            self._rebuild_component_auto_completion()
+
+    def _append_component_id(self, component_id, digest=None):
+        self._component_index_map.setdefault(component_id, len(self._ngl_component_ids))
+        if digest is not None:
+            self._component_digests[component_id] = digest
+        self._ngl_component_ids.append(component_id)
+
+    def _update_component_index_map(self):
+        self._component_index_map = {}
+        for index, component_id in enumerate(self._ngl_component_ids):
+            self._component_index_map.setdefault(component_id, index)
 
     def _remove_component(self, component):
         """tell NGL.Stage to remove component from Stage.compList
@@ -1383,7 +1731,38 @@ class NGLWidget(widgets.DOMWidget):
         """
         display(Javascript(script_template))
 
-    def _remote_call(self, method_name, target='Stage', args=None, kwargs=None):
+    @contextmanager
+    def hold_sync(self):
+        """Hold syncing state and NGL method calls until the outermost
+        context manager exits, then send the calls in a single message.
+
+        Examples
+        --------
+        >>> with view.hold_sync():
+        ...     view.add_cartoon()
+        ...     view.center_view()
+        """
+        if self._msg_queue is not None:
+            with super(NGLWidget, self).hold_sync():
+                yield
+            return
+
+        self._msg_queue = []
+        try:
+            with super(NGLWidget, self).hold_sync():
+                yield
+        finally:
+            msgs, self._msg_queue = self._msg_queue, None
+            self._send_msgs(msgs)
+
+    def _send_msgs(self, msgs):
+        if len(msgs) == 1:
+            self.send(msgs[0])
+        elif msgs:
+            self.send({'type': 'batch', 'msgs': msgs})
+
+    def _remote_call(self, method_name, target='Stage', args=None, kwargs=None,
+                     buffers=None):
         """call NGL's methods from Python.
         
         Parameters
@@ -1394,6 +1773,9 @@ class NGLWidget(widgets.DOMWidget):
         kwargs : dict
             if target is 'compList', "component_index" could be passed
             to specify which component will call the method.
+        buffers : list of bytes-like objects, optional
+            binary data sent along with the message (see ipywidgets'
+            Widget.send). JS gets them in msg.buffers.
 
         Examples
         --------
@@ -1408,56 +1790,52 @@ class NGLWidget(widgets.DOMWidget):
                           args=[True, "1-12"],
                           kwargs={'component_index': 1})
         """
-        args = [] if args is None else args
         kwargs = {} if kwargs is None else kwargs
 
-        msg = {}
-
-        if 'component_index' in kwargs:
-            msg['component_index'] = kwargs.pop('component_index')
-        if 'repr_index' in kwargs:
-            msg['repr_index'] = kwargs.pop('repr_index')
-
+        msg = _MSG_TEMPLATE.copy()
         msg['target'] = target
-        msg['type'] = 'call_method'
         msg['methodName'] = method_name
-        msg['args'] = args
+        msg['args'] = [] if args is None else args
+
+        component_index = kwargs.pop('component_index', _SENTINEL)
+        if component_index is not _SENTINEL:
+            msg['component_index'] = component_index
+        repr_index = kwargs.pop('repr_index', _SENTINEL)
+        if repr_index is not _SENTINEL:
+            msg['repr_index'] = repr_index
         msg['kwargs'] = kwargs
 
         if self.displayed is True:
-            self.send(msg)
+            if self._msg_queue is not None and buffers is None:
+                self._msg_queue.append(msg)
+            else:
+                if self._msg_queue:
+                    # keep the order of calls, a batch can not carry buffers
+                    self._send_msgs(self._msg_queue)
+                    self._msg_queue = []
+                self.send(msg, buffers=buffers)
         else:
-            # send later
-            def callback(widget, msg=msg):
-                widget.send(msg)
-
-            callback._method_name = method_name
-
-            # all callbacks will be called right after widget is loaded
-            self._ngl_displayed_callbacks.append(callback)
+            # all messages will be sent right after widget is loaded
+            self._ngl_pending_msgs.append((msg, buffers))
 
     def _get_traj_by_id(self, itsid):
         """return nglview.Trajectory or its derived class object
         """
-        for traj in self._trajlist:
-            if traj.id == itsid:
-                return traj
-        return None
+        return self._traj_by_id.get(itsid)
 
     def hide(self, indices):
         """set invisibility for given components (by their indices)
         """
-        traj_ids = set(traj.id for traj in self._trajlist)
-
+        component_ids = self._ngl_component_ids
+        get_traj = self._traj_by_id.get
+        # None: leave visibility as is
+        mask = [None] * len(component_ids)
         for index in indices:
-            comp_id = self._ngl_component_ids[index]
-            if comp_id in traj_ids:
-                traj = self._get_traj_by_id(comp_id)
+            mask[index] = False
+            traj = get_traj(component_ids[index])
+            if traj is not None:
                 traj.shown = False
-            self._remote_call("setVisibility",
-                    target='compList',
-                    args=[False,],
-                    kwargs={'component_index': index})
+        self._set_visibility_bulk(mask)
 
     def show(self, *args):
         self.show_only(*args)
@@ -1469,31 +1847,31 @@ class NGLWidget(widgets.DOMWidget):
         ----------
         indices : {'all', array-like}, component index, default 'all'
         """
-        traj_ids = set(traj.id for traj in self._trajlist)
-
         if indices == 'all':
             indices_ = set(range(self.n_components))
         else:
             indices_ = set(indices)
 
-        for index, comp_id in enumerate(self._ngl_component_ids):
-            if comp_id in traj_ids:
-                traj = self._get_traj_by_id(comp_id)
-            else:
-                traj = None
-            if index in indices_:
-                args = [True,]
-                if traj is not None:
-                    traj.shown = True
-            else:
-                args = [False,]
-                if traj is not None:
-                    traj.shown = False
+        component_ids = self._ngl_component_ids
+        get_traj = self._traj_by_id.get
+        mask = [index in indices_ for index in range(len(component_ids))]
+        for shown, comp_id in zip(mask, component_ids):
+            traj = get_traj(comp_id)
+            if traj is not None:
+                traj.shown = shown
+        self._set_visibility_bulk(mask)
 
-            self._remote_call("setVisibility",
-                    target='compList',
-                    args=args,
-                    kwargs={'component_index': index})
+    def _set_visibility_bulk(self, mask):
+        """set visibility of all components in a single call
+
+        Parameters
+        ----------
+        mask : list of {True, False, None}
+            visibility of each component, None to keep it
+        """
+        self._remote_call('setVisibilityAll',
+                target='Widget',
+                args=[mask,])
 
     def _js_console(self):
         self.send(dict(type='get', data='any'))
@@ -1508,25 +1886,72 @@ class NGLWidget(widgets.DOMWidget):
         return display.Image(self._image_data)
 
     def _clear_component_auto_completion(self):
+        # components added without auto-completion (e.g. dragged files) have
+        # no attribute
         for index, _ in enumerate(self._ngl_component_ids):
             name = 'component_' + str(index)
-            delattr(self, name)
+            if name in self.__dict__:
+                delattr(self, name)
+        for index, _ in enumerate(self._trajlist):
+            name = 'trajectory_' + str(index)
+            if name in self.__dict__:
+                delattr(self, name)
 
-    def _update_component_auto_completion(self):
-        trajids = [traj.id for traj in self._trajlist]
+    def _get_component_viewer(self, index):
+        '''return cached ComponentViewer for index-th component
 
-        for index, cid in enumerate(self._ngl_component_ids):
-            comp = ComponentViewer(self, index) 
-            name = 'component_' + str(index)
-            setattr(self, name, comp)
+        A cached viewer is only reused if it was made for the same component id.
+        '''
+        cid = self._ngl_component_ids[index]
+        cached = self._component_viewer_cache.get(index)
+        if cached is not None and cached[0] == cid:
+            return cached[1]
+        comp = ComponentViewer(self, index)
+        self._component_viewer_cache[index] = (cid, comp)
+        return comp
 
-            if cid in trajids:
-                traj_name = 'trajectory_' + str(trajids.index(cid))
-                setattr(self, traj_name, comp)
+    def _update_component_auto_completion(self, index=None):
+        '''add component_<index> (and trajectory_<i>) attributes for a single component
+
+        Parameters
+        ----------
+        index : int, default None
+            component index, None for the last added component
+        '''
+        if index is None:
+            index = len(self._ngl_component_ids) - 1
+        comp = self._get_component_viewer(index)
+        setattr(self, 'component_' + str(index), comp)
+
+        traj = self._get_traj_by_id(self._ngl_component_ids[index])
+        if traj is not None:
+            if self._trajlist[-1] is traj:
+                traj_index = len(self._trajlist) - 1
+            else:
+                traj_index = self._trajlist.index(traj)
+            setattr(self, 'trajectory_' + str(traj_index), comp)
+
+    def _rebuild_component_auto_completion(self):
+        n_components = len(self._ngl_component_ids)
+        for index in list(self._component_viewer_cache):
+            if index >= n_components:
+                del self._component_viewer_cache[index]
+
+        update = self._update_component_auto_completion
+        for index in range(n_components):
+            update(index)
+
+    def __getattr__(self, attr):
+        # add_cartoon, _remove_cartoon, ...
+        return _get_repr_method_shortcut(self, attr)
+
+    def __dir__(self):
+        return sorted(set(dir(type(self))) | set(self.__dict__) |
+                      set(_REPR_SHORTCUT_NAMES))
 
     def __getitem__(self, index):
         assert index < len(self._ngl_component_ids)
-        return ComponentViewer(self, index) 
+        return self._get_component_viewer(index)
 
     def __iter__(self):
         for i, _ in enumerate(self._ngl_component_ids):
@@ -1586,7 +2011,6 @@ class ComponentViewer(object):
     def __init__(self, view, index):
         self._view = view
         self._index = index
-        _add_repr_method_shortcut(self, self._view)
         self._borrow_attribute(self._view, ['clear_representations',
                                             '_remove_representations_by_name',
                                             'center_view',
@@ -1602,6 +2026,14 @@ class ComponentViewer(object):
     def id(self):
         return self._view._ngl_component_ids[self._index]
 
+    def __getattr__(self, attr):
+        # add_cartoon, _remove_cartoon, ...
+        return _get_repr_method_shortcut(self, attr)
+
+    def __dir__(self):
+        return sorted(set(dir(type(self))) | set(self.__dict__) |
+                      set(_REPR_SHORTCUT_NAMES))
+
     def hide(self):
         """set invisibility for given components (by their indices)
         """
@@ -1630,16 +2062,13 @@ class ComponentViewer(object):
         self._view.add_representation(repr_type=repr_type, selection=selection, **kwargs)
 
     def _borrow_attribute(self, view, attributes, trajectory_atts=None):
-        from functools import partial
-        from types import MethodType
-
         traj = view._get_traj_by_id(self.id)
 
         for attname in attributes:
+            # already bound to view
             view_att = getattr(view, attname)
-            setattr(self, '_' + attname, MethodType(view_att, view))
-            self_att = partial(getattr(view, attname), component=self._index)
-            setattr(self, attname, self_att) 
+            setattr(self, '_' + attname, view_att)
+            setattr(self, attname, partial(view_att, component=self._index))
 
         if traj is not None and trajectory_atts is not None:
             for attname in trajectory_atts:
@@ -1650,5 +2079,6 @@ from ._version import get_versions
 __version__ = get_versions()['version']
 del get_versions
 
+# keep the installed nbextension in sync with nglview/static (imports notebook)
 install()
 enable_nglview_js()
@@ -1,6 +1,5 @@
 import argparse
 from os.path import dirname, abspath, join
-from notebook.nbextensions import install_nbextension, enable_nbextension
 
 def install(user=True, symlink=False, overwrite=True, **kwargs):
     """Install the bqplot nbextension.
@@ -16,12 +15,16 @@ def install(user=True, symlink=False, overwrite=True, **kwargs):
     **kwargs: keyword arguments
         Other keyword arguments passed to the install_nbextension command
     """
+    # `import nglview` calls install(), so notebook is still loaded on import
+    from notebook.nbextensions import install_nbextension
+
     directory = join(dirname(abspath(__file__)), 'static')
     install_nbextension(directory, destination='nglview',
                         symlink=symlink, user=user, overwrite=overwrite,
                         **kwargs)
 
 def enable_nglview_js():
+    from notebook.nbextensions import enable_nbextension
     enable_nbextension('nglview-js', '')
 
     
@@ -1,3 +1,10 @@
+import numpy as np
+
+# numba (if installed) is only imported and its kernels compiled when
+# interpolating at least this many floats; it is not worth it for small systems
+_NUMBA_MIN_SIZE = 3 * 50000
+_numba_kernels = None
+
 def lerp(a, b, t):
     return (b - a) * t + a
 
@@ -10,6 +17,56 @@ def _spline(p0, p1, p2, p3, t, tension):
            ( -3 * p1 + 3 * p2 - 2 * v0 - v1 ) * t2 +
            v0 * t + p1)
 
+# kernels below take 1D arrays and write the result to `out`
+def _lerp(a, b, t, out):
+    np.subtract(b, a, out=out)
+    out *= t
+    out += a
+
+def _catmull_rom(p0, p1, p2, p3, t, tension, out):
+    out[:] = _spline(p0, p1, p2, p3, t, tension)
+
+# single pass loops, compiled by numba
+def _lerp_loop(a, b, t, out):
+    for i in range(out.shape[0]):
+        out[i] = (b[i] - a[i]) * t + a[i]
+
+def _catmull_rom_loop(p0, p1, p2, p3, t, tension, out):
+    t2 = t * t
+    t3 = t * t2
+    for i in range(out.shape[0]):
+        v0 = (p2[i] - p0[i]) * tension
+        v1 = (p3[i] - p1[i]) * tension
+        out[i] = ((2 * p1[i] - 2 * p2[i] + v0 + v1) * t3 +
+                  (-3 * p1[i] + 3 * p2[i] - 2 * v0 - v1) * t2 +
+                  v0 * t + p1[i])
+
+def _get_kernels(size):
+    """return (lerp, catmull_rom) kernels for arrays of given size
+    """
+    global _numba_kernels
+    if size < _NUMBA_MIN_SIZE:
+        return _lerp, _catmull_rom
+    if _numba_kernels is None:
+        try:
+            from numba import njit
+        except ImportError:
+            _numba_kernels = (_lerp, _catmull_rom)
+        else:
+            jit = njit(fastmath=True, cache=True)
+            _numba_kernels = (jit(_lerp_loop), jit(_catmull_rom_loop))
+    return _numba_kernels
+
+def _get_coordinates(traj, index):
+    # need to copy coordinates to avoid early memory free
+    # in pytraj
+    return np.array(traj.get_coordinates(index), dtype='f4')
+
+def _get_out(out, like):
+    if out is None or out.shape != like.shape:
+        out = np.empty_like(like)
+    return out
+
 doc ="""
 
     Parameters
@@ -18,29 +75,34 @@ doc ="""
     t : float, between 0. and 1.
     traj : nglview.Trajectory or subclass
     step : int, default=1
+    out : None or float32 array, default None
+        if given and having the right shape, store the result in it
 """
 
-def linear(index, t, traj, step=1):
-    # need to copy coordinates to avoid early memory free
-    # in pytraj
-    c = traj.get_coordinates(index).copy()
-    cp = traj.get_coordinates(min(index + step, traj.n_frames-1)).copy()
+def linear(index, t, traj, step=1, out=None):
+    c = _get_coordinates(traj, index)
+    cp = _get_coordinates(traj, min(index + step, traj.n_frames-1))
 
-    coords = lerp(cp, c, t)
+    coords = _get_out(out, c)
+    lerp_kernel, _ = _get_kernels(c.size)
+    lerp_kernel(cp.reshape(-1), c.reshape(-1), float(t), coords.reshape(-1))
     return coords
 
-def spline(index, t, traj, step=1):
+def spline(index, t, traj, step=1, out=None):
     i = index
     ip = min(index + step, traj.n_frames - 1)
     ipp = min(index + 2 * step, traj.n_frames - 1)
     ippp = min(index + 3 * step, traj.n_frames - 1)
 
-    c = traj.get_coordinates(i).copy()
-    cp = traj.get_coordinates(ip).copy()
-    cpp = traj.get_coordinates(ipp).copy()
-    cppp = traj.get_coordinates(ippp).copy()
+    c = _get_coordinates(traj, i)
+    cp = _get_coordinates(traj, ip)
+    cpp = _get_coordinates(traj, ipp)
+    cppp = _get_coordinates(traj, ippp)
 
-    coords = _spline(cppp, cpp, cp, c, t, tension=1)
+    coords = _get_out(out, c)
+    _, spline_kernel = _get_kernels(c.size)
+    spline_kernel(cppp.reshape(-1), cpp.reshape(-1), cp.reshape(-1), c.reshape(-1),
+                  float(t), 1., coords.reshape(-1))
     return coords
 
 linear.__doc__ = doc
@@ -2,6 +2,7 @@
 # simplify code
 from __future__ import absolute_import
 import json
+from ast import literal_eval
 import numpy as np
 from IPython.display import display, Javascript
 from ipywidgets import (DOMWidget,
@@ -490,7 +491,7 @@ class TrajectoryPlayer(DOMWidget):
         button_refresh.on_click(on_click_refresh)
 
         def on_click_update(button):
-            parameters = json.loads(repr_text_info.value.replace("False", "false").replace("True", "true"))
+            parameters = literal_eval(repr_text_info.value)
             self._view.update_representation(component=component_slider.value,
                                              repr_index=repr_slider.value,
                                              **parameters)
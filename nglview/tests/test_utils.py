@@ -1,6 +1,9 @@
 from __future__ import print_function
 import unittest
 from nglview.utils import seq_to_string, _camelize, _camelize_dict, FileManager
+from nglview.utils import _normalize_selection, _MMAP_THRESHOLD
+import os
+import tempfile
 import nose.tools as nt
 import gzip
 
@@ -8,6 +11,11 @@ def test_seq_to_string():
     nt.assert_equal(seq_to_string([1, 2, 3]), '@1,2,3')
     nt.assert_equal(seq_to_string('@1,2,3'), '@1,2,3')
 
+def test_normalize_selection():
+    nt.assert_equal(_normalize_selection(' protein '), 'protein')
+    nt.assert_equal(_normalize_selection((1, 2, 3)), '@1,2,3')
+    nt.assert_equal(_normalize_selection([1, 2, 3]), '@1,2,3')
+
 def test_camelize():
     nt.assert_equal(_camelize('remote_call'), 'remoteCall')
     nt.assert_equal(_camelize('flat_shaded'), 'flatShaded')
@@ -123,3 +131,17 @@ def test_file_passing_blob_from_gzip():
     nt.assert_false(fm.is_filename)
 
     nt.assert_raises(ValueError, lambda: fm.ext)
+
+def test_file_large_binary():
+    content = os.urandom(_MMAP_THRESHOLD + 1)
+    fd, fn = tempfile.mkstemp(suffix='.dcd')
+    os.write(fd, content)
+    os.close(fd)
+    try:
+        fh = FileManager(fn)
+        # read always gives bytes, mmap is opt-in
+        nt.assert_equal(fh.read(force_buffer=True), content)
+        nt.assert_true(fh.use_mmap)
+        nt.assert_equal(fh.read_mmap().tobytes(), content)
+    finally:
+        os.remove(fn)
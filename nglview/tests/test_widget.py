@@ -98,6 +98,7 @@ def test_API_promise_to_have():
 
     nv.NGLWidget.add_component
     nv.NGLWidget.add_trajectory
+    nv.NGLWidget.add_trajectories
     nv.NGLWidget.coordinates_dict
     nv.NGLWidget.set_representations
     nv.NGLWidget.clear
@@ -123,6 +124,9 @@ def test_load_data():
     # load blob with ext
     blob = open(nv.datafiles.PDB).read()
     view._load_data(blob, ext='pdb')
+    # blob cache is off by default
+    view._load_data(blob, ext='pdb')
+    nt.assert_equal(len(view._blob_digests), 0)
 
     # raise if passing blob but does not provide ext
     nt.assert_raises(ValueError, view._load_data, blob)
@@ -136,6 +140,87 @@ def test_load_data():
     # turn of for now
     # view._load_data('data/tz2.pdb')
 
+def test_load_large_binary_file():
+    import json
+    import tempfile
+    from nglview.utils import _MMAP_THRESHOLD
+
+    content = os.urandom(_MMAP_THRESHOLD + 1)
+    fd, fn = tempfile.mkstemp(suffix='.mmtf')
+    os.write(fd, content)
+    os.close(fd)
+    try:
+        view = nv.NGLWidget()
+        view.displayed = True
+        sent = []
+        view.send = lambda msg, buffers=None: sent.append((msg, buffers))
+
+        # file: raw bytes go out as a comm buffer
+        view._load_data(fn)
+        msg, buffers = sent[-1]
+        json.dumps(msg)
+        nt.assert_equal(bytes(buffers[0]), content)
+        if PY3:
+            import mmap
+            nt.assert_true(isinstance(buffers[0].obj, mmap.mmap))
+
+        # not displayed yet: the pending message holds bytes, not the mapped file
+        view = nv.NGLWidget()
+        view._load_data(fn)
+        buffers = view._ngl_pending_msgs[-1][1]
+        nt.assert_true(isinstance(buffers[0].obj, bytes))
+        nt.assert_equal(bytes(buffers[0]), content)
+
+        # Structure: get_structure_string is still bytes
+        structure = nv.FileStructure(fn)
+        nt.assert_equal(structure.get_structure_string(), content)
+    finally:
+        os.remove(fn)
+
+def test_blob_cache():
+    view = nv.NGLWidget()
+    view.displayed = True
+    sent = []
+    view.send = lambda msg, buffers=None: sent.append(msg)
+    view._blob_cache_nbytes = 2**20
+    blob = open(nv.datafiles.PDB).read()
+    blob2 = blob + '\n'
+
+    view.add_component(blob, ext='pdb')
+    view.add_component(blob, ext='pdb')
+    nt.assert_equal(sent[-1]['args'][0]['type'], 'cache_ref')
+
+    # new frontend (e.g. page reload) has nothing cached
+    view._ngl_handle_msg(view, {'type': 'blob_cache_reset'}, [])
+    view.add_component(blob, ext='pdb')
+    nt.assert_equal(sent[-1]['args'][0]['type'], 'blob')
+    view.remove_component(view._ngl_component_ids[-1])
+
+    # digest is kept while a component still uses it
+    view.remove_component(view._ngl_component_ids[-1])
+    nt.assert_equal(sent[-1]['methodName'], 'removeComponent')
+    view.remove_component(view._ngl_component_ids[-1])
+    nt.assert_equal(sent[-2]['methodName'], 'evictBlobs')
+    nt.assert_equal(len(view._blob_digests), 0)
+    nt.assert_equal(view._blob_cache_used, 0)
+    view.add_component(blob, ext='pdb')
+    nt.assert_equal(sent[-1]['args'][0]['type'], 'blob')
+
+    # least recently used blob is evicted to stay within budget
+    view._blob_cache_nbytes = len(blob2)
+    view.add_component(blob2, ext='pdb')
+    nt.assert_equal(sent[-2]['methodName'], 'evictBlobs')
+    nt.assert_equal(list(view._blob_digests), [sent[-1]['args'][0]['digest']])
+    view.add_component(blob, ext='pdb')
+    nt.assert_equal(sent[-1]['args'][0]['type'], 'blob')
+
+    # too large to be cached
+    view._blob_cache_nbytes = 1
+    view.add_component(blob2, ext='pdb')
+    nt.assert_equal(sent[-1]['args'][0]['digest'], None)
+    view.add_component(blob2, ext='pdb')
+    nt.assert_equal(sent[-1]['args'][0]['type'], 'blob')
+
 def test_representations():
     view = nv.show_pytraj(pt.datafiles.load_tz2())
     nt.assert_equal(view.representations, DEFAULT_REPR)
@@ -157,6 +242,12 @@ def test_add_repr_shortcut():
     assert isinstance(view, nv.NGLWidget), 'must be instance of NGLWidget'
     view.add_cartoon(color='residueindex')
     view.add_rope(color='red')
+    view.add_ball_and_stick('protein')
+    view._remove_cartoon()
+    view[0].add_licorice()
+    view[0]._remove_licorice()
+    nt.assert_true('add_cartoon' in dir(view))
+    nt.assert_raises(AttributeError, lambda: view.add_not_a_representation)
 
 def test_remote_call():
     # how to test JS?
@@ -167,6 +258,21 @@ def test_remote_call():
     kwargs = {'defaultRepresentation': True}
     view._remote_call('loadFile', target='stage', args=[fn,], kwargs=kwargs)
 
+def test_hold_sync():
+    view = nv.NGLWidget()
+    view.displayed = True
+    msgs = []
+    view.send = lambda msg, buffers=None: msgs.append(msg)
+
+    with view.hold_sync():
+        view._remote_call('centerView', target='Stage')
+        view._remote_call('autoView', target='Stage')
+        nt.assert_equal(msgs, [])
+    nt.assert_equal(len(msgs), 1)
+    nt.assert_equal(msgs[0]['type'], 'batch')
+    nt.assert_equal([m['methodName'] for m in msgs[0]['msgs']],
+                    ['centerView', 'autoView'])
+
 def test_download_image():
     """just make sure it can be called
     """
@@ -212,6 +318,13 @@ def test_encode_and_decode():
     new_xyz = nv.decode_base64(b64_str, dtype='f4', shape=shape)
     aa_eq(xyz, new_xyz) 
 
+def test_quantize_i2():
+    xyz = np.random.uniform(-50, 50, size=300).astype('f4')
+
+    q, scale, offset = nv._quantize_i2(xyz.copy())
+    nt.assert_equal(q.dtype, np.int16)
+    aa_eq(q * scale + offset, xyz, decimal=2)
+
 def test_coordinates_meta():
     from mdtraj.testing import get_fn
     fn, tn = [get_fn('frame0.pdb'),] * 2
@@ -270,6 +383,16 @@ def test_component_for_duck_typing():
     view.remove_component(c0.id)
     nt.assert_false(hasattr(view, 'component_2'))
 
+def test_remove_component_after_dragged_file():
+    view = nv.NGLWidget()
+    # a file dragged into the viewer has no component_<i> attribute
+    view._n_dragged_files = 1
+    traj = nv.PyTrajTrajectory(pt.datafiles.load_tz2())
+    view.add_trajectory(traj)
+    view.remove_component(traj.id)
+    nt.assert_true(hasattr(view, 'component_0'))
+    nt.assert_false(hasattr(view, 'component_1'))
+
 def test_trajectory_show_hide_sending_cooridnates():
     view = NGLWidget()
 
@@ -307,7 +430,12 @@ def test_trajectory_show_hide_sending_cooridnates():
     view.hide([0, 1])
     nt.assert_false(view._trajlist[0].shown)
     nt.assert_false(view._trajlist[1].shown)
+    # no coordinates are sent
+    sent = []
+    view.send = lambda msg, buffers=None: sent.append(msg)
+    view._frame_push_interval = 0
     view.frame = 3
+    nt.assert_equal(sent, [])
     coordinates_dict = copy_coordinate_dict(view)
     nt.assert_equal(coordinates_dict[0].shape[0], 0)
     nt.assert_equal(coordinates_dict[1].shape[0], 0)
@@ -372,6 +500,101 @@ def test_player_link_to_ipywidgets():
     # we set min=10
     nt.assert_equal(view.player.delay, 10)
 
+def test_frame_reads_trajectory_again():
+    pytraj_traj = pt.datafiles.load_tz2()
+    view = NGLWidget(nv.PyTrajTrajectory(pytraj_traj))
+    view._frame_push_interval = 0
+    sent = []
+    view.send = lambda msg, buffers=None: sent.append(buffers)
+
+    for frame in [1, 2, 1, 2]:
+        view.frame = frame
+    # coordinates changed in place (e.g. superpose)
+    xyz = pytraj_traj.xyz
+    xyz[1] += 1.
+    pytraj_traj.xyz = xyz
+    view.frame = 1
+    aa_eq(np.frombuffer(sent[-1][1], dtype='f4'), pytraj_traj[1].xyz.ravel(), decimal=4)
+
+def test_send_concat_buffer():
+    import struct
+
+    view = NGLWidget()
+    sent = []
+    view.send = lambda msg, buffers=None: sent.append((msg, buffers))
+    xyz0 = np.arange(6, dtype='f8').reshape(2, 3)
+    xyz2 = np.arange(3, dtype='f4') + 10.
+
+    view._send_concat_buffer([(0, xyz0), (2, xyz2)])
+    msg, (header, data) = sent[-1]
+    nt.assert_equal(msg, {'type': 'binary_v2'})
+    header = bytes(header)
+    nt.assert_equal(len(header), struct.calcsize('<2I2d4I'))
+    nt.assert_equal(struct.unpack('<2I2d4I', header),
+                    (2, 0, 1., 0., 0, 2, 6, 3))
+    aa_eq(np.frombuffer(data, dtype='<f4'),
+          np.concatenate([xyz0.ravel(), xyz2]))
+
+    # quantized: int16 with scale and offset
+    view._wire_dtype = 'i2'
+    view._send_concat_buffer([(1, xyz0)])
+    msg, (header, data) = sent[-1]
+    n, dtype_code, scale, shift, index, length = struct.unpack('<2I2d2I', bytes(header))
+    nt.assert_equal((n, dtype_code, index, length), (1, 1, 1, 6))
+    aa_eq(np.frombuffer(data, dtype='<i2') * scale + shift, xyz0.ravel(), decimal=3)
+
+def test_static_bundle_is_up_to_date():
+    # batch, binary_v2, ... are only understood by a bundle built from js/src
+    root = os.path.join(os.path.dirname(nv.__file__), os.pardir)
+    src_fn = os.path.join(root, 'js', 'src', 'nglview-js.js')
+    if not os.path.exists(src_fn):
+        raise unittest.SkipTest('no js source')
+    src = open(src_fn).read()
+    src = src.replace('require("jupyter-js-widgets")', '__webpack_require__(2)')
+    src = src.replace("require('./ngl')", '__webpack_require__(3)')
+    # webpack indents module code with a tab
+    module = '\n'.join('\t' + line for line in src.rstrip('\n').split('\n'))
+    bundle = open(os.path.join(os.path.dirname(nv.__file__), 'static', 'index.js')).read()
+    nt.assert_true(module in bundle, 'rebuild nglview/static/index.js (python setup.py --npm)')
+
+def test_frame_coalescing():
+    import threading
+    from tornado.ioloop import IOLoop
+
+    loop = IOLoop()
+    view = NGLWidget()
+    view._ioloop = loop
+    view._frame_push_interval = 0.01
+    # frozen clock: every change after the first one is within the interval
+    view._clock = lambda: 100.
+    sent = []
+
+    def set_coordinates(index):
+        sent.append(index)
+        if len(sent) == 2:
+            loop.stop()
+    view._set_coordinates = set_coordinates
+
+    view.frame = 1
+    nt.assert_equal(sent, [1])
+
+    # changed from another thread (e.g. player): only the last frame is sent,
+    # by the kernel's loop
+    def move():
+        for frame in range(2, 10):
+            view.frame = frame
+    thread = threading.Thread(target=move)
+    thread.start()
+    thread.join()
+    nt.assert_equal(sent, [1])
+
+    # timeout, in case the frame is never sent
+    loop.call_later(10, loop.stop)
+    loop.start()
+    loop.close()
+    nt.assert_equal(sent, [1, 9])
+    nt.assert_equal(view._frame_timer, None)
+
 def test_add_struture_then_trajectory():
     view = nv.show_structure_file('data/tz2.pdb')
     traj = pt.datafiles.load_trpcage()
@@ -380,6 +603,24 @@ def test_add_struture_then_trajectory():
     coords = view.coordinates_dict[1].copy()
     aa_eq(coords, traj[3].xyz)
 
+def test_bulk_add():
+    view = nv.NGLWidget()
+    traj = pt.datafiles.load_tz2()
+    with view.bulk_add():
+        view.add_trajectory(traj)
+        view.add_trajectory(traj)
+        nt.assert_false(hasattr(view, 'component_0'))
+    nt.assert_true(hasattr(view, 'trajectory_1'))
+    nt.assert_equal(view.count, traj.n_frames)
+
+    # remove a component added in the same bulk_add
+    with view.bulk_add():
+        t = nv.PyTrajTrajectory(traj)
+        view.add_trajectory(t)
+        view.remove_component(t.id)
+    nt.assert_true(hasattr(view, 'component_1'))
+    nt.assert_false(hasattr(view, 'component_2'))
+
 def test_interpolation():
     view = default_view()
 
@@ -387,6 +628,14 @@ def test_interpolation():
     nt.assert_equal(view.player.iparams.get('type'), 'linear')
     nt.assert_equal(view.player.iparams.get('step'), 1)
 
+    # coordinates_dict is not overwritten by the next frame
+    view._frame_push_interval = 0
+    view.frame = 1
+    coords = view.coordinates_dict[0]
+    expected = coords.copy()
+    view.frame = 2
+    aa_eq(coords, expected)
+
     def func():
         view.player.interpolate = True
         view.player.iparams = dict(type='spline_typos')
@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 import os, sys
+import mmap
 import gzip, bz2
 from zipfile import ZipFile
 
@@ -14,6 +15,15 @@ if PY3:
 else:
     string_types = basestring
 
+try:
+    from functools import lru_cache
+except ImportError:
+    # Python 2: no memoization
+    def lru_cache(maxsize=128):
+        def decorator(func):
+            return func
+        return decorator
+
 def get_repr_names_from_dict(repr_dict, component):
     """
     
@@ -59,8 +69,35 @@ def seq_to_string(seq):
         return seq
     else:
         # assume 1D array
-        return "@" + ",".join(str(s) for s in seq)
+        # numpy array: convert to a list of Python int in C first
+        tolist = getattr(seq, 'tolist', None)
+        if tolist is not None:
+            seq = tolist()
+        return "@" + ",".join(map(str, seq))
+
+@lru_cache(maxsize=256)
+def _cached_selection(selection):
+    return seq_to_string(selection).strip()
 
+def _normalize_selection(selection):
+    """seq_to_string(selection).strip(), memoized for str and tuple input
+
+    Examples
+    --------
+    >>> _normalize_selection(' protein ')
+    'protein'
+    >>> _normalize_selection([1, 3])
+    '@1,3'
+    """
+    if isinstance(selection, (string_types, tuple)):
+        try:
+            return _cached_selection(selection)
+        except TypeError:
+            # unhashable items
+            pass
+    return seq_to_string(selection).strip()
+
+@lru_cache(maxsize=512)
 def _camelize(snake):
     """
     
@@ -75,7 +112,12 @@ def _camelize(snake):
     return words[0] + "".join(x.title() for x in words[1:])
 
 def _camelize_dict(kwargs):
-    return dict((_camelize(k), v) for k, v in kwargs.items())
+    # keys are camelized once and then served from _camelize's cache
+    return {_camelize(k): v for k, v in kwargs.items()}
+
+
+# binary files larger than this (in bytes) are memory-mapped instead of read
+_MMAP_THRESHOLD = 1 << 20
 
 
 class FileManager(object):
@@ -115,6 +157,23 @@ class FileManager(object):
                 else:
                     return self.src
 
+    @property
+    def use_mmap(self):
+        '''True if the file is binary and large enough to be memory-mapped
+        (see `read_mmap`)
+        '''
+        return (PY3 and self.is_filename and not self.compressed_ext and
+                self.is_binary and os.path.getsize(self.src) > _MMAP_THRESHOLD)
+
+    def read_mmap(self):
+        '''return a read-only memoryview of the memory-mapped file
+
+        The OS pages the file in when it is read, there is no copy in
+        Python's heap. Only meant to be sent as a comm buffer.
+        '''
+        with open(self.src, 'rb') as fh:
+            return memoryview(mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ))
+
     @property
     def compressed(self):
         '''naive detection